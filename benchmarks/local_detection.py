@@ -0,0 +1,299 @@
+"""Micro-benchmarks of local game detection paths running every second.
+
+Synthetic process tables (1k-20k processes, 10-1000 installed games) stand in for psutil and generated
+LauncherInstalled.dat files of growing size are parsed. For every case per-call latency, peak allocated memory
+and number of psutil calls are reported; each call on a synthetic process stands for a syscall or a /proc read
+of real psutil.
+
+Usage: python benchmarks/local_detection.py [--check] [--update-baselines] [--tolerance 2.0] [--filter NAME]
+--check exits with 1 when a case is slower, allocates more or makes more calls than its stored baseline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+import psutil  # noqa: E402
+
+import consts  # noqa: E402
+
+# launcher process is defined only for Windows and macOS; synthetic tables do not need the real one
+if not hasattr(consts, 'LAUNCHER_PROCESS_IDENTIFIER'):
+    consts.LAUNCHER_PROCESS_IDENTIFIER = 'EpicGamesLauncher.exe'
+
+from galaxy.api.types import LocalGameState  # noqa: E402
+from local import LauncherInstalledParser, LocalGamesProvider  # noqa: E402
+from process_watcher import ProcessWatcher  # noqa: E402
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+PROCESS_COUNTS = [1000, 5000, 20000]
+GAME_COUNTS = [10, 100, 1000]
+INSTALLED_COUNTS = [10, 100, 1000, 5000]
+LAUNCHER_EXE = 'C:\\Program Files (x86)\\Epic Games\\Launcher\\Portal\\Binaries\\Win64\\EpicGamesLauncher.exe'
+
+_calls = 0
+
+
+class SyntheticProcess:
+    """Implements the part of psutil.Process used by the watcher; counts calls reaching the OS in psutil"""
+    def __init__(self, pid, exe, children=()):
+        self.pid = pid
+        self._exe = exe
+        self._children = list(children)
+
+    def exe(self):
+        global _calls
+        _calls += 1
+        return self._exe
+
+    def children(self, recursive=True):
+        global _calls
+        _calls += 1
+        return self._children
+
+    def is_running(self):
+        global _calls
+        _calls += 1
+        return True
+
+    def status(self):
+        global _calls
+        _calls += 1
+        return psutil.STATUS_RUNNING
+
+    def __hash__(self):
+        return self.pid
+
+    def __eq__(self, other):
+        return self is other
+
+
+def _game_dir(i):
+    return f'D:\\Epic Games\\Game{i:05d}'
+
+
+def _process_table(processes, games, running=10):
+    """System processes, `running` game processes and a launcher having 1% of the table as children"""
+    table = [SyntheticProcess(pid, f'C:\\Windows\\System32\\svc{pid:05d}.exe') for pid in range(100, 100 + processes)]
+    game_procs = [
+        SyntheticProcess(100000 + i, _game_dir(i * (games // running or 1) % games) + '\\Binaries\\Game.exe')
+        for i in range(min(running, games))
+    ]
+    children = table[:max(processes // 100 - len(game_procs), 0)] + game_procs
+    launcher = SyntheticProcess(1, LAUNCHER_EXE, children)
+    table[:len(game_procs)] = game_procs
+    return [launcher] + table, launcher
+
+
+def _watcher(games):
+    watcher = ProcessWatcher('EpicGamesLauncher')
+    watcher.watched_games = {f'game{i}': _game_dir(i) for i in range(games)}
+    return watcher
+
+
+def _installed_file(directory, entries):
+    path = os.path.join(directory, f'LauncherInstalled{entries}.dat')
+    installation_list = []
+    for i in range(entries):
+        installation_list.append({
+            'InstallLocation': _game_dir(i),
+            'AppName': f'UE_4.{i}' if i % 10 == 0 else f'game{i}',
+            'AppID': 0,
+            'AppVersion': '1.0.0-CL-123456-Windows'
+        })
+    with open(path, 'w') as f:
+        json.dump({'InstallationList': installation_list}, f, indent=4)
+    return path
+
+
+def measure(func, ops=1, repeat=7):
+    """Best latency per op in microseconds, peak allocation per call in bytes and psutil calls per op"""
+    global _calls
+    func()  # warm up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) / ops)
+
+    _calls = 0
+    func()
+    calls = _calls / ops
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'latency_us': round(min(timings) * 1e6, 2),
+        'peak_alloc_bytes': peak,
+        'psutil_calls': round(calls, 2)
+    }
+
+
+def bench_parse(tmp_dir):
+    for entries in INSTALLED_COUNTS:
+        parser = LauncherInstalledParser()
+        parser._path = _installed_file(tmp_dir, entries)
+        yield f'parse[installed={entries}]', lambda: measure(parser.parse)
+
+
+def bench_match_process():
+    for processes in PROCESS_COUNTS:
+        for games in GAME_COUNTS:
+            table, _ = _process_table(processes, games)
+            watcher = _watcher(games)
+            match = watcher._ProcessWatcher__match_process
+
+            def run():
+                for proc in table:
+                    match(proc)
+
+            yield f'match_process[procs={processes},games={games}]', lambda: measure(run, ops=len(table))
+
+
+def bench_search_in_children():
+    for processes in PROCESS_COUNTS:
+        for games in GAME_COUNTS:
+            _, launcher = _process_table(processes, games)
+            watcher = _watcher(games)
+            yield (
+                f'search_in_children[procs={processes},games={games}]',
+                lambda: measure(lambda: watcher._search_in_children([launcher]))
+            )
+
+
+def bench_get_running_games():
+    for processes in PROCESS_COUNTS:
+        for games in GAME_COUNTS:
+            table, launcher = _process_table(processes, games)
+            watcher = _watcher(games)
+            watcher._ProcessWatcher__match_process(launcher)
+            watcher._search_in_children([launcher])
+            yield (
+                f'get_running_games[procs={processes},games={games}]',
+                lambda: measure(lambda: watcher.get_running_games(check_under_launcher=True))
+            )
+
+
+def _snapshot_scan(processes, repeat=3):
+    watcher = _watcher(100)
+    # fresh process objects for every call of measure: warm up, timed repeats, call and allocation counts
+    tables = [_process_table(processes, 100)[0] for _ in range(repeat + 3)]
+
+    def process_iter(*args, **kwargs):
+        global _calls
+        _calls += 1
+        return iter(tables.pop())
+
+    def run():
+        watcher._snapshots._snapshot = None
+        loop.run_until_complete(watcher._serach_in_all(max_age=0))
+
+    original = psutil.process_iter
+    psutil.process_iter = process_iter
+    loop = asyncio.new_event_loop()
+    try:
+        return measure(run, repeat=repeat)
+    finally:
+        loop.close()
+        psutil.process_iter = original
+
+
+def bench_snapshot_scan():
+    """Scan finding every process new: listing, exe resolution and matching of the whole table"""
+    for processes in PROCESS_COUNTS:
+        yield f'snapshot_scan[procs={processes},games=100]', lambda: _snapshot_scan(processes)
+
+
+def bench_update_game_statuses():
+    for games in GAME_COUNTS:
+        provider = LocalGamesProvider()
+        provider._first_run = False
+        previous = {f'game{i}' for i in range(games)}
+        current = {f'game{i}' for i in range(games // 10, games + games // 10)}
+
+        def run():
+            provider._update_game_statuses(previous, current, LocalGameState.Installed)
+            provider._update_game_statuses(current, previous, LocalGameState.Installed)
+            provider.consume_updated_games()
+
+        yield f'update_game_statuses[games={games}]', lambda: measure(run, ops=2)
+
+
+def run_benchmarks(name_filter=None):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        suites = [
+            bench_parse(tmp_dir),
+            bench_match_process(),
+            bench_search_in_children(),
+            bench_get_running_games(),
+            bench_snapshot_scan(),
+            bench_update_game_statuses()
+        ]
+        results = {}
+        for suite in suites:
+            # cases are measured lazily so that filtered out ones are not run at all
+            for name, run_case in suite:
+                if name_filter and name_filter not in name:
+                    continue
+                results[name] = result = run_case()
+                print(
+                    f'{name:55} {result["latency_us"]:12.2f} us/call '
+                    f'{result["peak_alloc_bytes"] / 1024:10.1f} KiB peak {result["psutil_calls"]:8.2f} psutil calls/call'
+                )
+        return results
+
+
+def check(results, baselines, tolerance):
+    failures = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            print(f'no baseline for {name}')
+            continue
+        if result['latency_us'] > baseline['latency_us'] * tolerance:
+            failures.append(f'{name}: latency {result["latency_us"]:.2f}us > {baseline["latency_us"]:.2f}us')
+        if result['peak_alloc_bytes'] > baseline['peak_alloc_bytes'] * tolerance + 1024:
+            failures.append(f'{name}: peak alloc {result["peak_alloc_bytes"]}B > {baseline["peak_alloc_bytes"]}B')
+        if result['psutil_calls'] > baseline['psutil_calls'] + 0.5:
+            failures.append(f'{name}: psutil calls {result["psutil_calls"]:.2f} > {baseline["psutil_calls"]:.2f}')
+    for failure in failures:
+        print('FAIL: ' + failure)
+    return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--check', action='store_true', help='compare with stored baselines')
+    parser.add_argument('--update-baselines', action='store_true', help='store results as new baselines')
+    parser.add_argument('--tolerance', type=float, default=2.0, help='allowed latency and allocation growth factor')
+    parser.add_argument('--filter', help='run only cases with names containing this string')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.filter)
+
+    if args.update_baselines:
+        baselines = {}
+        if os.path.exists(BASELINES_PATH):
+            with open(BASELINES_PATH) as f:
+                baselines = json.load(f)
+        baselines.update(results)
+        with open(BASELINES_PATH, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'Baselines stored in {BASELINES_PATH}')
+    if args.check:
+        with open(BASELINES_PATH) as f:
+            return 0 if check(results, json.load(f), args.tolerance) else 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""Plugin startup latency: import time of plugin.py and time from process spawn to the first RPC response.
+
+Usage: python benchmarks/startup.py [--runs N] [--max-import-ms MS] [--max-first-rpc-ms MS]
+Exits with 1 when a median exceeds the given limit.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src')
+PLUGIN_PATH = os.path.join(SRC_DIR, 'plugin.py')
+# ssl is left out as asyncio imports it
+HEAVY_MODULES = ['aiohttp', 'certifi', 'psutil', 'webbrowser', 'process_watcher']
+
+_IMPORT_PROBE = '''
+import sys, time, json
+start = time.perf_counter()
+import plugin
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+''' % HEAVY_MODULES
+
+
+def _env():
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [SRC_DIR, env.get('PYTHONPATH')]))
+    return env
+
+
+def measure_import():
+    output = subprocess.check_output([sys.executable, '-c', _IMPORT_PROBE], env=_env())
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+async def measure_first_rpc(timeout=30):
+    """Spawn the plugin the way Galaxy does and time the answer to get_capabilities"""
+    connected = asyncio.get_event_loop().create_future()
+
+    def on_connect(reader, writer):
+        if not connected.done():
+            connected.set_result((reader, writer))
+
+    server = await asyncio.start_server(on_connect, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    start = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, PLUGIN_PATH, 'benchmark-token', str(port), env=_env(),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        reader, writer = await asyncio.wait_for(connected, timeout)
+        connected_after = time.perf_counter() - start
+        request = {"jsonrpc": "2.0", "id": "1", "method": "get_capabilities", "params": {}}
+        writer.write((json.dumps(request) + "\n").encode())
+        await writer.drain()
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            if not line:
+                raise RuntimeError('Plugin has closed the connection')
+            message = json.loads(line)
+            if "error" in message:
+                raise RuntimeError(f'Plugin has answered with an error: {message["error"]}')
+            if message.get("id") == "1":
+                break
+        writer.close()
+        return connected_after, time.perf_counter() - start
+    finally:
+        if process.returncode is None:
+            process.kill()
+        await process.wait()
+        server.close()
+        await server.wait_closed()
+
+
+def _ms(seconds):
+    return seconds * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-import-ms', type=float)
+    parser.add_argument('--max-first-rpc-ms', type=float)
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    import_median = statistics.median(result['elapsed'] for result in imports)
+    print(f'import plugin:   median {_ms(import_median):8.1f} ms')
+    print(f'  heavy modules loaded at import: {imports[-1]["loaded"] or "none"}')
+
+    loop = asyncio.get_event_loop()
+    rpcs = [loop.run_until_complete(measure_first_rpc()) for _ in range(args.runs)]
+    connect_median = statistics.median(connected for connected, _ in rpcs)
+    rpc_median = statistics.median(answered for _, answered in rpcs)
+    print(f'connect:         median {_ms(connect_median):8.1f} ms')
+    print(f'first rpc:       median {_ms(rpc_median):8.1f} ms')
+
+    failed = False
+    if args.max_import_ms is not None and _ms(import_median) > args.max_import_ms:
+        print(f'FAIL: import time exceeds {args.max_import_ms} ms')
+        failed = True
+    if args.max_first_rpc_ms is not None and _ms(rpc_median) > args.max_first_rpc_ms:
+        print(f'FAIL: time to first rpc exceeds {args.max_first_rpc_ms} ms')
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
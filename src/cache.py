@@ -0,0 +1,105 @@
+import json
+import logging as log
+import os
+from typing import List, Optional, Tuple
+
+from galaxy.api.consts import LicenseType
+from galaxy.api.types import FriendInfo, Game, LicenseInfo
+
+
+class JsonFileCache:
+    """Json document kept on disk between plugin runs; written atomically"""
+    def __init__(self, path):
+        self._path = path
+
+    def load(self) -> dict:
+        try:
+            with open(self._path, 'r') as f:
+                content = json.load(f)
+        except FileNotFoundError as e:
+            log.debug(str(e))
+            return {}
+        except (OSError, ValueError) as e:
+            log.warning(f'Loading {self._path} has failed: {e}')
+            return {}
+        return content if isinstance(content, dict) else {}
+
+    def save(self, content: dict):
+        tmp_path = self._path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            with open(tmp_path, 'w') as f:
+                json.dump(content, f)
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            log.warning(f'Saving {self._path} has failed: {e}')
+
+
+class AccountCache:
+    """Last authenticated account: account_id and display_name"""
+    def __init__(self, path):
+        self._file = JsonFileCache(path)
+
+    def load(self) -> Optional[Tuple[str, str]]:
+        content = self._file.load()
+        account_id, display_name = content.get('account_id'), content.get('display_name')
+        if not isinstance(account_id, str) or not isinstance(display_name, str):
+            return None
+        return account_id, display_name
+
+    def save(self, account_id, display_name):
+        self._file.save({'account_id': account_id, 'display_name': display_name})
+
+
+class OwnedGamesCache:
+    """Last known owned games of an account: game_id, title and license"""
+    def __init__(self, path):
+        self._file = JsonFileCache(path)
+
+    def load(self, account_id) -> Optional[List[Game]]:
+        content = self._file.load()
+        if content.get('account_id') != account_id:
+            return None
+        try:
+            return [
+                Game(entry['game_id'], entry['title'], None, LicenseInfo(LicenseType(entry['license'])))
+                for entry in content['games']
+            ]
+        except (KeyError, TypeError, ValueError) as e:
+            log.warning(f'Owned games cache is corrupted: {e}')
+            return None
+
+    def save(self, account_id, games: List[Game]):
+        self._file.save({
+            'account_id': account_id,
+            'games': [
+                {
+                    'game_id': game.game_id,
+                    'title': game.game_title,
+                    'license': game.license_info.license_type.value
+                }
+                for game in games
+            ]
+        })
+
+
+class FriendsCache:
+    """Last known friends of an account: user_id and user_name"""
+    def __init__(self, path):
+        self._file = JsonFileCache(path)
+
+    def load(self, account_id) -> Optional[List[FriendInfo]]:
+        content = self._file.load()
+        if content.get('account_id') != account_id:
+            return None
+        try:
+            return [FriendInfo(entry['user_id'], entry['user_name']) for entry in content['friends']]
+        except (KeyError, TypeError) as e:
+            log.warning(f'Friends cache is corrupted: {e}')
+            return None
+
+    def save(self, account_id, friends: List[FriendInfo]):
+        self._file.save({
+            'account_id': account_id,
+            'friends': [{'user_id': friend.user_id, 'user_name': friend.user_name} for friend in friends]
+        })
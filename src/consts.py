@@ -10,12 +10,14 @@ class System(EnumMeta):
 
 
 _program_data = ''
+_local_app_data = ''
 
 SYSTEM = None
 
 if sys.platform == 'win32':
     SYSTEM = System.WINDOWS
     _program_data = os.getenv('PROGRAMDATA')
+    _local_app_data = os.getenv('LOCALAPPDATA')
     EPIC_WINREG_LOCATION = "SOFTWARE\\WOW6432Node\\Epic Games\\EpicGamesLauncher"
     LAUNCHER_WINREG_LOCATION = r"Computer\HKEY_CLASSES_ROOT\com.epicgames.launcher\shell\open\command"
     LAUNCHER_PROCESS_IDENTIFIER = 'EpicGamesLauncher.exe'
@@ -23,6 +25,7 @@ if sys.platform == 'win32':
 elif sys.platform == 'darwin':
     SYSTEM = System.MACOS
     _program_data = os.path.expanduser('~/Library/Application Support')
+    _local_app_data = _program_data
     EPIC_MAC_INSTALL_LOCATION = "/Applications/Epic Games Launcher.app"
     LAUNCHER_PROCESS_IDENTIFIER = 'Epic Games Launcher'
 
@@ -30,3 +33,9 @@ LAUNCHER_INSTALLED_PATH = os.path.join(_program_data,
                                        'Epic',
                                        'UnrealEngineLauncher',
                                        'LauncherInstalled.dat')
+
+PLUGIN_CACHE_DIR = os.path.join(_local_app_data, 'galaxy-epic')
+OWNED_GAMES_CACHE_PATH = os.path.join(PLUGIN_CACHE_DIR, 'owned_games.json')
+FRIENDS_CACHE_PATH = os.path.join(PLUGIN_CACHE_DIR, 'friends.json')
+GAME_TIMES_JOURNAL_PATH = os.path.join(PLUGIN_CACHE_DIR, 'game_times.journal')
+ACCOUNT_CACHE_PATH = os.path.join(PLUGIN_CACHE_DIR, 'account.json')
@@ -0,0 +1,124 @@
+import logging as log
+import os
+import time
+from typing import Dict, Optional, Set, Tuple
+
+
+class GameTimeTracker:
+    """Playtime from game sessions reported by the local process watcher.
+
+    Finished sessions are appended to a journal of tab separated records:
+        S <game_id> <start> <end>       single session
+        T <game_id> <seconds> <last>    total seconds played and last played time of all compacted sessions
+    Compaction rewrites the journal to a single T record per game. Totals are kept in memory.
+    """
+    COMPACT_INTERVAL = 24 * 60 * 60
+    COMPACT_AFTER_SESSIONS = 200
+
+    def __init__(self, path):
+        self._path = path
+        self._totals = None  # {game_id: [seconds, last_played]}; loaded on first use
+        self._running = {}  # {game_id: session start}
+        self._updated = set()
+        self._sessions_since_compaction = 0
+        self._last_compaction = time.time()
+
+    def _get_totals(self) -> Dict[str, list]:
+        if self._totals is None:
+            self._totals = {}
+            self._load()
+        return self._totals
+
+    def _load(self):
+        try:
+            with open(self._path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    self._load_record(line)
+        except FileNotFoundError as e:
+            log.debug(str(e))
+        except OSError as e:
+            log.warning(f'Loading game times from {self._path} has failed: {e}')
+        if self._sessions_since_compaction:
+            self.compact()
+
+    def _load_record(self, line):
+        try:
+            kind, game_id, first, second = line.rstrip('\n').split('\t')
+            first, second = int(first), int(second)
+        except ValueError:
+            log.warning(f'Skipping malformed game times record: {line!r}')
+            return
+        if kind == 'S':
+            self._add(game_id, second - first, second)
+            self._sessions_since_compaction += 1
+        elif kind == 'T':
+            self._add(game_id, first, second)
+
+    def _add(self, game_id, seconds, last_played):
+        totals = self._totals.setdefault(game_id, [0, 0])
+        totals[0] += seconds
+        totals[1] = max(totals[1], last_played)
+
+    def start_session(self, game_id):
+        self._running.setdefault(game_id, int(time.time()))
+
+    def end_session(self, game_id):
+        start = self._running.pop(game_id, None)
+        if start is None:
+            return
+        end = int(time.time())
+        self._get_totals()
+        self._add(game_id, end - start, end)
+        self._append(f'S\t{game_id}\t{start}\t{end}\n')
+        self._sessions_since_compaction += 1
+        self._updated.add(game_id)
+
+    def end_all_sessions(self):
+        for game_id in list(self._running):
+            self.end_session(game_id)
+
+    def get(self, game_id) -> Tuple[Optional[int], Optional[int]]:
+        """Return minutes played and last played time; both None if the game was never played"""
+        totals = self._get_totals().get(game_id)
+        start = self._running.get(game_id)
+        if totals is None and start is None:
+            return None, None
+        seconds, last_played = totals if totals is not None else (0, 0)
+        if start is not None:
+            now = int(time.time())
+            seconds, last_played = seconds + now - start, now
+        return seconds // 60, last_played
+
+    def consume_updated_games(self) -> Set[str]:
+        tmp = self._updated.copy()
+        self._updated.clear()
+        return tmp
+
+    def compact_if_needed(self):
+        if not self._sessions_since_compaction:
+            return
+        if self._sessions_since_compaction >= self.COMPACT_AFTER_SESSIONS \
+                or time.time() - self._last_compaction >= self.COMPACT_INTERVAL:
+            self.compact()
+
+    def compact(self):
+        log.debug(f'Compacting game times journal; sessions: {self._sessions_since_compaction}')
+        tmp_path = self._path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for game_id, (seconds, last_played) in self._get_totals().items():
+                    f.write(f'T\t{game_id}\t{seconds}\t{last_played}\n')
+            os.replace(tmp_path, self._path)
+        except OSError as e:
+            log.warning(f'Compacting {self._path} has failed: {e}')
+            return
+        self._sessions_since_compaction = 0
+        self._last_compaction = time.time()
+
+    def _append(self, record):
+        try:
+            os.makedirs(os.path.dirname(self._path), exist_ok=True)
+            with open(self._path, 'a', encoding='utf-8') as f:
+                f.write(record)
+        except OSError as e:
+            log.warning(f'Saving game session to {self._path} has failed: {e}')
@@ -1,12 +1,8 @@
 import asyncio
 import logging
-import ssl
 from base64 import b64encode
 from http import HTTPStatus
 
-import aiohttp
-import certifi
-
 from galaxy.api.errors import (
     AccessDenied, AuthenticationRequired,
     BackendTimeout, BackendNotAvailable, BackendError, UnknownBackendResponse,
@@ -26,6 +22,10 @@ class AuthenticatedHttpClient:
 
     _OAUTH_URL = "https://account-public-service-prod03.ol.epicgames.com/account/api/oauth/token"
 
+    _PROBE_MIN_INTERVAL = 5
+    _PROBE_MAX_INTERVAL = 5 * 60
+    _PROBE_TIMEOUT = 10
+
     LAUNCHER_USER_AGENT = (
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
         "AppleWebKit/537.36 (KHTML, like Gecko) "
@@ -40,14 +40,35 @@ class AuthenticatedHttpClient:
         self._account_id = None
         self._auth_lost_callback = None
         self._store_credentials = store_credentials_callback
-        ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
-        ssl_context.load_verify_locations(certifi.where())
-        connector = aiohttp.TCPConnector(limit=20, ssl=ssl_context)
-        self._session = aiohttp.ClientSession(connector=connector)
+        self._session = None
+        self._offline = False
+        self._probe_task = None
+        self._back_online_callback = None
+
+    @property
+    def session(self):
+        """Created on first request to keep aiohttp, ssl and certifi out of the plugin startup"""
+        if self._session is None:
+            import ssl
+            import aiohttp
+            import certifi
+            ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            ssl_context.load_verify_locations(certifi.where())
+            connector = aiohttp.TCPConnector(limit=20, ssl=ssl_context)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
 
     def set_auth_lost_callback(self, callback):
         self._auth_lost_callback = callback
 
+    def set_back_online_callback(self, callback):
+        self._back_online_callback = callback
+
+    @property
+    def offline(self):
+        """Set after a request has failed to connect; cleared by the background connectivity probe"""
+        return self._offline
+
     async def authenticate_with_exchage_code(self, exchange_code):
         await self._authenticate("exchange_code", exchange_code)
 
@@ -67,7 +88,13 @@ class AuthenticatedHttpClient:
     def refresh_token(self):
         return self._refresh_token
 
+    def restore_account(self, account_id):
+        """Account of the stored refresh token, known from a previous run; used while offline"""
+        self._account_id = account_id
+
     async def get(self, *args, **kwargs):
+        if self._offline:
+            raise NetworkError()
         if not self.authenticated:
             raise AuthenticationRequired()
 
@@ -76,6 +103,8 @@ class AuthenticatedHttpClient:
         except AuthenticationRequired:
             try:
                 await self._refresh_tokens()
+            except (NetworkError, BackendTimeout):
+                raise
             except Exception:
                 logging.exception("Failed to refresh tokens")
                 if self._auth_lost_callback:
@@ -85,6 +114,10 @@ class AuthenticatedHttpClient:
             return await self._authorized_get(*args, **kwargs)
 
     async def close(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+        if self._session is None:
+            return
         await self._session.close()
         logging.debug('http client session closed')
 
@@ -119,11 +152,16 @@ class AuthenticatedHttpClient:
             raise UnknownBackendResponse()
 
     async def _request(self, method, *args, **kwargs):
+        if self._offline:
+            raise NetworkError()
+        import aiohttp  # imported with the session; only a sys.modules lookup here
         try:
-            response = await self._session.request(method, *args, **kwargs)
+            response = await self.session.request(method, *args, **kwargs)
         except asyncio.TimeoutError:
+            # slow backend, not lost connection
             raise BackendTimeout()
         except aiohttp.ClientConnectionError:
+            self._went_offline()
             raise NetworkError()
         logging.debug(f"Request response status: {response.status}")
         if response.status == HTTPStatus.UNAUTHORIZED:
@@ -139,6 +177,33 @@ class AuthenticatedHttpClient:
 
         return response
 
+    def _went_offline(self):
+        if self._offline:
+            return
+        logging.warning("Network is not available, switching to offline mode")
+        self._offline = True
+        self._probe_task = asyncio.create_task(self._probe_connectivity())
+
+    async def _probe_connectivity(self):
+        import aiohttp
+        interval = self._PROBE_MIN_INTERVAL
+        timeout = aiohttp.ClientTimeout(total=self._PROBE_TIMEOUT)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                response = await self.session.request("HEAD", self._OAUTH_URL, timeout=timeout)
+                response.release()
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError) as e:
+                interval = min(interval * 2, self._PROBE_MAX_INTERVAL)
+                logging.debug(f"Network still not available: {repr(e)}; next probe in {interval}s")
+            else:
+                break
+        logging.info("Network is available again, leaving offline mode")
+        self._offline = False
+        self._probe_task = None
+        if self._back_online_callback:
+            self._back_online_callback()
+
     async def _authorized_get(self, *args, **kwargs):
         headers = kwargs.setdefault("headers", {})
         headers["Authorization"] = "bearer " + self._access_token
@@ -0,0 +1,189 @@
+"""Opt-in event loop instrumentation; enabled by setting GALAXY_EPIC_PROFILE environment variable.
+
+Measures event loop lag, records callbacks and task steps blocking the loop longer than a threshold
+(with the stack of the loop thread captured while it was blocked) and keeps sampled timings of named
+sections. Everything is dumped to the log periodically.
+"""
+import asyncio
+import contextlib
+import functools
+import logging as log
+import os
+import statistics
+import sys
+import threading
+import time
+import traceback
+from collections import defaultdict, deque
+
+ENABLED = bool(os.getenv('GALAXY_EPIC_PROFILE'))
+
+_monitor = None
+
+
+class LoopMonitor:
+    def __init__(self, loop, threshold=0.1, ping_interval=0.05, dump_interval=60, samples=200):
+        """
+        :param threshold        callbacks running longer than that (in seconds) are reported as slow
+        :param ping_interval    how often the watchdog thread pings the loop to measure its lag
+        :param dump_interval    how often the report is written to the log
+        :param samples          how many latest samples are kept per measured section
+        """
+        self._loop = loop
+        self._threshold = threshold
+        self._ping_interval = ping_interval
+        self._dump_interval = dump_interval
+        self._lags = deque(maxlen=samples)
+        self._timings = defaultdict(lambda: deque(maxlen=samples))
+        self._slow_callbacks = []
+        self._loop_thread_id = threading.get_ident()
+        self._pending_ping = None
+        self._stall_stack = None
+        self._active = False
+        self._original_handle_run = None
+        self._dumper = None
+
+    def start(self):
+        self._active = True
+        self._patch_handles()
+        threading.Thread(target=self._watchdog, name='loop-watchdog', daemon=True).start()
+        self._dumper = self._loop.create_task(self._dump_periodically())
+        log.info(f'Loop monitor started; slow callback threshold: {self._threshold}s')
+
+    def stop(self):
+        self._active = False
+        if self._original_handle_run is not None:
+            asyncio.events.Handle._run = self._original_handle_run
+            self._original_handle_run = None
+        if self._dumper is not None:
+            self._dumper.cancel()
+        self.dump()
+
+    def record(self, name, duration):
+        self._timings[name].append(duration)
+
+    def _patch_handles(self):
+        original = self._original_handle_run = asyncio.events.Handle._run
+        monitor = self
+
+        def _run(handle):
+            start = time.perf_counter()
+            try:
+                original(handle)
+            finally:
+                duration = time.perf_counter() - start
+                if duration > monitor._threshold:
+                    monitor._on_slow_callback(handle, duration)
+
+        asyncio.events.Handle._run = _run
+
+    def _on_slow_callback(self, handle, duration):
+        owner = getattr(handle._callback, '__self__', None)
+        name = repr(owner) if isinstance(owner, asyncio.Future) else repr(handle)
+        stack, self._stall_stack = self._stall_stack, None
+        self._slow_callbacks.append((duration, name, stack))
+
+    def _watchdog(self):
+        while self._active:
+            ping = self._pending_ping
+            if ping is None:
+                self._pending_ping = sent = time.perf_counter()
+                try:
+                    self._loop.call_soon_threadsafe(self._pong, sent)
+                except RuntimeError:  # loop closed
+                    return
+            elif self._stall_stack is None and time.perf_counter() - ping > self._threshold:
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self._stall_stack = ''.join(traceback.format_stack(frame))
+            time.sleep(self._ping_interval)
+
+    def _pong(self, sent):
+        self._lags.append(time.perf_counter() - sent)
+        self._stall_stack = None
+        self._pending_ping = None
+
+    async def _dump_periodically(self):
+        while True:
+            await asyncio.sleep(self._dump_interval)
+            self.dump()
+
+    def dump(self):
+        lines = ['Loop monitor report']
+        if self._lags:
+            lines.append(f'  loop lag: {self._describe(self._lags)}')
+        for name, samples in sorted(self._timings.items()):
+            lines.append(f'  {name}: {self._describe(samples)}')
+        slow, self._slow_callbacks = self._slow_callbacks, []
+        lines.append(f'  slow callbacks (>{self._threshold * 1000:.0f}ms) since last report: {len(slow)}')
+        for duration, name, stack in sorted(slow, key=lambda entry: entry[0], reverse=True)[:10]:
+            lines.append(f'    {duration * 1000:.1f}ms {name}')
+            if stack:
+                lines.append('      ' + stack.rstrip().replace('\n', '\n      '))
+        log.info('\n'.join(lines))
+
+    @staticmethod
+    def _describe(samples):
+        ordered = sorted(samples)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        return (
+            f'n={len(ordered)} mean={statistics.mean(ordered) * 1000:.1f}ms '
+            f'p50={statistics.median(ordered) * 1000:.1f}ms p95={p95 * 1000:.1f}ms max={ordered[-1] * 1000:.1f}ms'
+        )
+
+
+def start(**kwargs):
+    """Start monitoring the running loop if instrumentation is enabled"""
+    global _monitor
+    if not ENABLED or _monitor is not None:
+        return
+    _monitor = LoopMonitor(asyncio.get_event_loop(), **kwargs)
+    _monitor.start()
+
+
+def stop():
+    global _monitor
+    if _monitor is not None:
+        _monitor.stop()
+        _monitor = None
+
+
+@contextlib.contextmanager
+def _measured(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _monitor is not None:
+            _monitor.record(name, time.perf_counter() - start)
+
+
+_NOT_MEASURED = contextlib.nullcontext()
+
+
+def measure(name):
+    """Context manager recording duration of the block as a sample of `name`"""
+    if _monitor is None:
+        return _NOT_MEASURED
+    return _measured(name)
+
+
+def timed(name=None):
+    """Decorator recording duration of each call; leaves function untouched when instrumentation is disabled"""
+    def decorator(func):
+        if not ENABLED:
+            return func
+        label = name or func.__name__
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with measure(label):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with measure(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
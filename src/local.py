@@ -6,8 +6,8 @@ import os.path
 
 from galaxy.api.types import LocalGameState
 
+from instrumentation import measure
 from consts import LAUNCHER_INSTALLED_PATH, SYSTEM, System, LAUNCHER_PROCESS_IDENTIFIER
-from process_watcher import ProcessWatcher
 
 if SYSTEM == System.WINDOWS:
     import winreg
@@ -58,9 +58,10 @@ class LauncherInstalledParser:
 
 
 class LocalGamesProvider:
-    def __init__(self):
+    def __init__(self, game_time_tracker=None):
+        self._game_time_tracker = game_time_tracker
         self._parser = LauncherInstalledParser()
-        self._ps_watcher = ProcessWatcher(LAUNCHER_PROCESS_IDENTIFIER)
+        self._watcher = None
         self._games = defaultdict(lambda: LocalGameState.None_)
         self._updated_games = set()
         self._was_installed = dict()
@@ -80,6 +81,14 @@ class LocalGamesProvider:
         elif SYSTEM == System.MACOS:
             return os.path.exists(EPIC_MAC_INSTALL_LOCATION)
 
+    @property
+    def _ps_watcher(self):
+        """Created on first use to keep psutil out of the plugin startup"""
+        if self._watcher is None:
+            from process_watcher import ProcessWatcher
+            self._watcher = ProcessWatcher(LAUNCHER_PROCESS_IDENTIFIER)
+        return self._watcher
+
     @property
     def first_run(self):
         return self._first_run
@@ -113,12 +122,16 @@ class LocalGamesProvider:
         while True:
             try:
                 if self.is_launcher_installed:
-                    self.check_for_installed()
+                    with measure('status_checker_installed_check'):
+                        self.check_for_installed()
                     if 0 == counter % 21:
-                        await self.parse_all_procs_if_needed()
-                    elif 0 == counter % 7:
-                        self.check_for_running(check_for_new=True)
-                    self.check_for_running()
+                        # wall time of the throttled scan, mostly spent sleeping; not loop occupancy
+                        with measure('status_checker_process_scan'):
+                            await self.parse_all_procs_if_needed()
+                    with measure('status_checker_running_check'):
+                        if 0 != counter % 21 and 0 == counter % 7:
+                            self.check_for_running(check_for_new=True)
+                        self.check_for_running()
             except Exception as e:
                 log.error(e)
             finally:
@@ -136,11 +149,16 @@ class LocalGamesProvider:
 
     async def parse_all_procs_if_needed(self):
         if len(self._was_installed) > 0 and len(self._was_running) == 0:
-            await self._ps_watcher._serach_in_all_slowly(interval=0.015)
+            await self._ps_watcher._serach_in_all(interval=0.015)
 
     def check_for_running(self, check_for_new=False):
         running = self._ps_watcher.get_running_games(check_under_launcher=check_for_new)
         self._update_game_statuses(self._was_running, running, LocalGameState.Running)
+        if self._game_time_tracker is not None:
+            for id_ in (running - self._was_running):
+                self._game_time_tracker.start_session(id_)
+            for id_ in (self._was_running - running):
+                self._game_time_tracker.end_session(id_)
         self._was_running = running
 
     def _update_game_statuses(self, previous, current, status):
@@ -3,18 +3,22 @@ import re
 import sys
 import subprocess
 import logging as log
-import webbrowser
 
 from galaxy.api.plugin import Plugin, create_and_run_plugin
 from galaxy.api.consts import Platform, LicenseType
-from galaxy.api.types import Authentication, Game, LicenseInfo, FriendInfo, LocalGame, NextStep
-from galaxy.api.errors import InvalidCredentials, UnknownBackendResponse
+from galaxy.api.types import Authentication, Game, GameTime, LicenseInfo, FriendInfo, LocalGame, NextStep
+from galaxy.api.errors import InvalidCredentials, UnknownBackendResponse, NetworkError, BackendTimeout
 
 from backend import EpicClient
 from http_client import AuthenticatedHttpClient
 from version import __version__
 from local import LocalGamesProvider
-from consts import System, SYSTEM
+from cache import AccountCache, OwnedGamesCache, FriendsCache
+from game_time import GameTimeTracker
+import instrumentation
+from consts import (
+    System, SYSTEM, ACCOUNT_CACHE_PATH, OWNED_GAMES_CACHE_PATH, FRIENDS_CACHE_PATH, GAME_TIMES_JOURNAL_PATH
+)
 
 AUTH_URL = r"https://launcher-website-prod07.ol.epicgames.com/epic-login"
 AUTH_REDIRECT_URL = r"https://localhost/exchange?code="
@@ -65,18 +69,78 @@ class EpicPlugin(Plugin):
         super().__init__(Platform.Epic, __version__, reader, writer, token)
         self._http_client = AuthenticatedHttpClient(store_credentials_callback=self.store_credentials)
         self._epic_client = EpicClient(self._http_client)
-        self._local_provider = LocalGamesProvider()
+        self._game_time_tracker = GameTimeTracker(GAME_TIMES_JOURNAL_PATH)
+        self._local_provider = LocalGamesProvider(self._game_time_tracker)
         self._games_cache = {}
+        self._account_cache = AccountCache(ACCOUNT_CACHE_PATH)
+        self._offline_session = False
+        self._owned_games_cache = OwnedGamesCache(OWNED_GAMES_CACHE_PATH)
+        self._friends_cache = FriendsCache(FRIENDS_CACHE_PATH)
         self._refresh_owned_task = None
+        self._owned_games_reconciled = False
+        self._owned_games_warm_up = None
+        self._friends_warm_up = None
+        instrumentation.start()
+
+    def _start_warm_up(self):
+        """Fetch library and friends as soon as there is a token, before Galaxy asks for them"""
+        log.info("Starting warm-up of owned games and friends")
+        self._cancel_warm_up()
+        self._owned_games_warm_up = asyncio.create_task(self._get_owned_games())
+        self._friends_warm_up = asyncio.create_task(self._get_friends())
+
+    def _cancel_warm_up(self):
+        for task in (self._owned_games_warm_up, self._friends_warm_up):
+            if not task:
+                continue
+            if task.done() and not task.cancelled():
+                task.exception()  # mark failure of a never consumed warm-up as retrieved
+            task.cancel()
+        self._owned_games_warm_up = None
+        self._friends_warm_up = None
+
+    @staticmethod
+    async def _warmed_up(task, fetch):
+        """Result of the warm-up task if it has succeeded, fresh fetch otherwise"""
+        if task is not None:
+            try:
+                return await task
+            except Exception as e:
+                log.warning(f"Warm-up has failed, fetching again: {repr(e)}")
+        return await fetch()
 
     async def _do_auth(self):
-        user_info = await self._epic_client.get_users_info([self._http_client.account_id])
-        display_name = self._epic_client.get_display_name(user_info)
-
         self._http_client.set_auth_lost_callback(self.lost_authentication)
+        self._http_client.set_back_online_callback(self._on_back_online)
+        self._start_warm_up()
+        try:
+            user_info = await self._epic_client.get_users_info([self._http_client.account_id])
+            display_name = self._epic_client.get_display_name(user_info)
+        except BaseException:
+            self._cancel_warm_up()
+            raise
 
+        self._account_cache.save(self._http_client.account_id, display_name)
         return Authentication(self._http_client.account_id, display_name)
 
+    def _offline_auth(self):
+        """Authentication of the last account when there is no network but its library and friends are cached"""
+        if not self._http_client.offline:
+            return None
+        account = self._account_cache.load()
+        if account is None:
+            return None
+        account_id, display_name = account
+        if self._owned_games_cache.load(account_id) is None or self._friends_cache.load(account_id) is None:
+            return None
+        log.info("Network is down, authenticating from the cached account until it is back")
+        self._http_client.restore_account(account_id)
+        self._http_client.set_auth_lost_callback(self.lost_authentication)
+        self._http_client.set_back_online_callback(self._on_back_online)
+        self._offline_session = True
+        return Authentication(account_id, display_name)
+
+    @instrumentation.timed()
     async def authenticate(self, stored_credentials=None):
         if not stored_credentials:
             return NextStep("web_session", AUTH_PARAMS, js=AUTH_JS)
@@ -84,17 +148,25 @@ class EpicPlugin(Plugin):
         refresh_token = stored_credentials["refresh_token"]
         try:
             await self._http_client.authenticate_with_refresh_token(refresh_token)
+        except (NetworkError, BackendTimeout):
+            auth = self._offline_auth()
+            if auth is None:
+                raise
+            return auth
         except Exception:
             # TODO: distinguish between login-related and all other (networking, server, e.t.c.) errors
             raise InvalidCredentials()
 
         return await self._do_auth()
 
+    @instrumentation.timed()
     async def pass_login_credentials(self, step, credentials, cookies):
         try:
             await self._http_client.authenticate_with_exchage_code(
                 credentials["end_uri"].split(AUTH_REDIRECT_URL, 1)[1]
             )
+        except (NetworkError, BackendTimeout):
+            raise
         except Exception:
             # TODO: distinguish between login-related and all other (networking, server, e.t.c.) errors
             raise InvalidCredentials()
@@ -102,6 +174,9 @@ class EpicPlugin(Plugin):
         return await self._do_auth()
 
     async def _get_title_sanitized(self, app_name):
+        if not self._games_cache:
+            for game in self._owned_games_cache.load(self._http_client.account_id) or []:
+                self._games_cache[game.game_id] = game
         if app_name in self._games_cache:
             return self._games_cache[app_name].game_title.replace(" ", "-").lower()
         log.debug('Nothing found, fallback to epic client')
@@ -128,13 +203,60 @@ class EpicPlugin(Plugin):
             games.append(game)
         return games
 
+    def _store_owned_games(self):
+        self._owned_games_cache.save(self._http_client.account_id, list(self._games_cache.values()))
+
+    @instrumentation.timed()
     async def get_owned_games(self):
-        games = await self._get_owned_games()
+        warm_up, self._owned_games_warm_up = self._owned_games_warm_up, None
+        if self._refresh_owned_task:
+            self._refresh_owned_task.cancel()
+            self._refresh_owned_task = None
+        cached = self._owned_games_cache.load(self._http_client.account_id)
+        if cached is not None:
+            log.info(f"Serving {len(cached)} owned games from cache")
+            for game in cached:
+                self._games_cache[game.game_id] = game
+            self._owned_games_reconciled = False
+            self._refresh_owned_task = asyncio.create_task(self._reconcile_owned_games(warm_up))
+            return cached
+
+        games = await self._warmed_up(warm_up, self._get_owned_games)
         for game in games:
             self._games_cache[game.game_id] = game
+        self._store_owned_games()
+        self._owned_games_reconciled = True
         self._refresh_owned_task = asyncio.create_task(self._check_for_new_games())
         return games
 
+    async def _reconcile_owned_games(self, warm_up=None, delay=0):
+        """Bring games served from cache in line with backend; retried from tick until it succeeds"""
+        await asyncio.sleep(delay)
+        log.info("Reconciling cached owned games")
+        try:
+            games = {game.game_id: game for game in await self._warmed_up(warm_up, self._get_owned_games)}
+        except Exception as e:
+            log.warning(f"Reconciling owned games has failed: {repr(e)}")
+            return
+
+        for game_id in list(self._games_cache):
+            if game_id not in games:
+                log.info(f"Game {game_id} is no longer owned")
+                del self._games_cache[game_id]
+                self.remove_game(game_id)
+        for game_id, game in games.items():
+            cached = self._games_cache.get(game_id)
+            if cached is None:
+                log.info(f"Found new game, {game}")
+                self.add_game(game)
+            elif cached != game:
+                log.info(f"Updating game {game}")
+                self.update_game(game)
+            self._games_cache[game_id] = game
+        self._store_owned_games()
+        self._owned_games_reconciled = True
+
+    @instrumentation.timed()
     async def get_local_games(self):
         if self._local_provider.first_run:
             self._local_provider.setup()
@@ -147,11 +269,12 @@ class EpicPlugin(Plugin):
         try:
             title = await self._get_title_sanitized(game_id)
             title = title.replace(" ", "-").lower()
-        except UnknownBackendResponse:
+        except (UnknownBackendResponse, NetworkError, BackendTimeout):
             url = "https://www.epicgames.com/"
         else:
             url = f"https://www.epicgames.com/store/product/{title}/home"
         log.info(f"Opening Epic website {url}")
+        import webbrowser
         webbrowser.open(url)
 
     @property
@@ -173,6 +296,7 @@ class EpicPlugin(Plugin):
         subprocess.Popen(cmd, shell=True)
         await self._local_provider.search_process(game_id, timeout=30)
 
+    @instrumentation.timed()
     async def uninstall_game(self, game_id):
         if not self._local_provider.is_launcher_installed:
             await self.open_epic_browser(game_id)
@@ -182,6 +306,7 @@ class EpicPlugin(Plugin):
         log.info(f"Uninstalling game {title}")
         subprocess.Popen(cmd, shell=True)
 
+    @instrumentation.timed()
     async def install_game(self, game_id):
         if not self._local_provider.is_launcher_installed:
             await self.open_epic_browser(game_id)
@@ -191,7 +316,68 @@ class EpicPlugin(Plugin):
         log.info(f"Installing game {title}")
         subprocess.Popen(cmd, shell=True)
 
+    @instrumentation.timed()
     async def get_friends(self):
+        warm_up, self._friends_warm_up = self._friends_warm_up, None
+        try:
+            friends = await self._warmed_up(warm_up, self._get_friends)
+        except (NetworkError, BackendTimeout):
+            cached = self._friends_cache.load(self._http_client.account_id)
+            if cached is None:
+                raise
+            log.info(f"Network is not available, serving {len(cached)} friends from cache")
+            return cached
+        self._friends_cache.save(self._http_client.account_id, friends)
+        return friends
+
+    async def _refresh_friends(self):
+        cached = self._friends_cache.load(self._http_client.account_id)
+        if cached is None:
+            return
+        try:
+            friends = {friend.user_id: friend for friend in await self._get_friends()}
+        except Exception as e:
+            log.warning(f"Refreshing friends has failed: {repr(e)}")
+            return
+        cached = {friend.user_id: friend for friend in cached}
+        for user_id in cached.keys() - friends.keys():
+            self.remove_friend(user_id)
+        for user_id in friends.keys() - cached.keys():
+            self.add_friend(friends[user_id])
+        self._friends_cache.save(self._http_client.account_id, list(friends.values()))
+
+    def _on_back_online(self):
+        if self._offline_session:
+            asyncio.create_task(self._restore_session())
+            return
+        self._refresh_after_offline()
+
+    async def _restore_session(self):
+        """Token refresh postponed by an offline start; a timeout is retried, a lost connection waits for the probe"""
+        while True:
+            try:
+                await self._http_client.authenticate_with_refresh_token(self._http_client.refresh_token)
+                break
+            except NetworkError:
+                return
+            except BackendTimeout:
+                await asyncio.sleep(60)
+            except Exception:
+                log.exception("Restoring session after going back online has failed")
+                self.lost_authentication()
+                return
+        self._offline_session = False
+        self._refresh_after_offline()
+
+    def _refresh_after_offline(self):
+        log.info("Refreshing owned games and friends after going back online")
+        # owned games are refreshed only once Galaxy has imported them
+        if self._refresh_owned_task:
+            self._refresh_owned_task.cancel()
+            self._refresh_owned_task = asyncio.create_task(self._reconcile_owned_games())
+        asyncio.create_task(self._refresh_friends())
+
+    async def _get_friends(self):
         ids = await self._epic_client.get_friends_list()
         account_ids = []
         friends = []
@@ -210,6 +396,18 @@ class EpicPlugin(Plugin):
             for friend in friends
         ]
 
+    @instrumentation.timed()
+    async def get_game_time(self, game_id, context):
+        time_played, last_played_time = self._game_time_tracker.get(game_id)
+        return GameTime(game_id, time_played, last_played_time)
+
+    def _update_game_times(self):
+        for id_ in self._game_time_tracker.consume_updated_games():
+            time_played, last_played_time = self._game_time_tracker.get(id_)
+            log.debug(f'Updating game {id_} time to {time_played} minutes')
+            self.update_game_time(GameTime(id_, time_played, last_played_time))
+        self._game_time_tracker.compact_if_needed()
+
     def _update_local_game_statuses(self):
         updated = self._local_provider.consume_updated_games()
         for id_ in updated:
@@ -219,6 +417,8 @@ class EpicPlugin(Plugin):
 
     async def _check_for_new_games(self):
         await asyncio.sleep(60)  # interval
+        if self._http_client.offline:
+            return
 
         log.info("Checking for new games")
         assets = await self._epic_client.get_assets()
@@ -232,17 +432,27 @@ class EpicPlugin(Plugin):
                 log.info(f"Found new game, {game}")
                 self.add_game(game)
                 self._games_cache[game.game_id] = game
+                self._store_owned_games()
 
+    @instrumentation.timed()
     def tick(self):
         if not self._local_provider.first_run:
             self._update_local_game_statuses()
+            self._update_game_times()
 
         if self._refresh_owned_task and self._refresh_owned_task.done():
-            self._refresh_owned_task = asyncio.create_task(self._check_for_new_games())
+            if self._owned_games_reconciled:
+                self._refresh_owned_task = asyncio.create_task(self._check_for_new_games())
+            else:
+                self._refresh_owned_task = asyncio.create_task(self._reconcile_owned_games(delay=60))
 
     def shutdown(self):
-        self._local_provider._status_updater.cancel()
+        if self._local_provider._status_updater:
+            self._local_provider._status_updater.cancel()
+        self._game_time_tracker.end_all_sessions()
+        self._cancel_warm_up()
         asyncio.create_task(self._http_client.close())
+        instrumentation.stop()
 
 
 def main():
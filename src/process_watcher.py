@@ -2,72 +2,200 @@ import asyncio
 import psutil
 import logging as log
 import time
-from typing import Dict, Iterable
-from dataclasses import dataclass
-from collections import defaultdict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
 
 
-@dataclass
 class WatchedApp:
-    id: str
-    dir: str
-    is_game: bool = True
-
-    def __eq__(self, other):
-        if isinstance(other, WatchedApp):
-            return self.id == other.id
-        elif type(other) == str:
-            return self.id == other
-        else:
-            raise TypeError(f"Trying to compare {type(self)} with {type(other)}")
+    __slots__ = ('id', 'dir', 'is_game', 'procs')
+
+    def __init__(self, id: str, dir: str, is_game: bool = True):
+        self.id = id
+        self.dir = dir
+        self.is_game = is_game
+        self.procs = {}  # {pid: psutil.Process}
+
+    def __repr__(self):
+        return f'WatchedApp(id={self.id!r}, dir={self.dir!r}, is_game={self.is_game}, procs={list(self.procs)})'
+
+
+class ProcessSnapshot:
+    __slots__ = ('timestamp', 'procs', 'exes', 'added', 'removed')
 
-    def __hash__(self):
-        return hash(self.id)
+    def __init__(self, timestamp: float, procs: Dict[int, psutil.Process], exes: Dict[int, str],
+                 added: List[int], removed: List[int]):
+        self.timestamp = timestamp  # when the scan has started
+        self.procs = procs  # {pid: psutil.Process}
+        self.exes = exes  # {pid: exe path or ''}
+        self.added = added  # pids not present in the previous snapshot
+        self.removed = removed  # pids of the previous snapshot that are gone
+
+
+class ProcessSnapshotService:
+    """Single source of full process table scans shared by all watchers.
+    Requests within the freshness window get the last snapshot; concurrent requests await the same scan.
+    Subscribers are coroutines awaited with every new snapshot before the waiters are resumed.
+    """
+    _YIELD_EVERY = 50
+
+    def __init__(self, freshness=1.0):
+        self._freshness = freshness
+        self._snapshot = None
+        self._pending = None
+        self._scan_interval = 0  # of the pending scan; dropped when a caller without interval joins
+        self._subscribers = []
+
+    @property
+    def snapshot(self) -> Optional[ProcessSnapshot]:
+        return self._snapshot
+
+    def subscribe(self, callback: Callable[[ProcessSnapshot], Awaitable[None]]):
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[ProcessSnapshot], Awaitable[None]]):
+        self._subscribers.remove(callback)
+
+    async def get(self, max_age=None, interval=0) -> ProcessSnapshot:
+        """
+        :param max_age      accept snapshot of a scan started at most max_age seconds before the call;
+                            defaults to service freshness
+        :param interval     sleep between processes when a new scan has to be started
+        """
+        if max_age is None:
+            max_age = self._freshness
+        oldest_accepted = time.time() - max_age
+        while True:
+            if self._snapshot is not None and self._snapshot.timestamp >= oldest_accepted:
+                return self._snapshot
+            if self._pending is None or self._pending.done():
+                self._scan_interval = interval
+                self._pending = asyncio.ensure_future(self._scan())
+                self._pending.add_done_callback(self._scan_done)
+            elif not interval:
+                # do not keep a caller in need of fresh processes behind a throttled scan
+                self._scan_interval = 0
+            # the pending scan may have started too early for this caller; then the next one is awaited
+            await asyncio.shield(self._pending)
+
+    def _scan_done(self, _):
+        self._pending = None
+
+    async def _scan(self):
+        log.debug(f'Performing check for all processes; interval: {self._scan_interval}')
+        started = time.time()
+        prev = self._snapshot
+        prev_procs = prev.procs if prev is not None else {}
+        prev_exes = prev.exes if prev is not None else {}
+        procs, exes, added = {}, {}, []
+        for i, proc in enumerate(psutil.process_iter()):
+            pid = proc.pid
+            procs[pid] = proc
+            # process_iter yields the same object for the same process, new one if pid was reused
+            if prev_procs.get(pid) is proc:
+                exes[pid] = prev_exes[pid]
+            else:
+                try:
+                    exes[pid] = proc.exe()
+                except (psutil.AccessDenied, psutil.NoSuchProcess):
+                    exes[pid] = ''
+                added.append(pid)
+            if self._scan_interval:
+                await asyncio.sleep(self._scan_interval)
+            elif i % self._YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+        removed = [pid for pid, proc in prev_procs.items() if procs.get(pid) is not proc]
+        snapshot = ProcessSnapshot(started, procs, exes, added, removed)
+        for callback in self._subscribers:
+            try:
+                await callback(snapshot)
+            except Exception as e:
+                log.exception(f'Process snapshot subscriber {callback} has failed: {e}')
+        # published after subscribers so that waiters resumed by it see processes already matched
+        self._snapshot = snapshot
+        return snapshot
 
 
 class _ProcessWatcher:
     """Low level methods"""
-    def __init__(self):
-        self._watched_apps = defaultdict(set)  # {WatchedApp: set([proc1, proc2, ...])}
+    _MATCH_YIELD_EVERY = 50
+
+    def __init__(self, snapshots: Optional[ProcessSnapshotService] = None):
+        self._snapshots = snapshots if snapshots is not None else ProcessSnapshotService()
+        self._snapshots.subscribe(self._on_snapshot)
+        self._rematch = True  # match whole next snapshot, not only new processes
+        self._launchers = {}  # {app_id: WatchedApp}
+        self._games = {}  # {game_id: WatchedApp}
+        self._pid_index = {}  # {pid: WatchedApp}
+        self._running = set()  # ids of games with at least one tracked process
         self._cache = {}
 
     @property
-    def watched_games(self):
-        return {k: v for k, v in self._watched_apps.items() if k.is_game}
+    def watched_games(self) -> Dict[str, WatchedApp]:
+        return self._games
 
     @watched_games.setter
     def watched_games(self, to_watch: Dict[str, str]):
         # remove games not present in to_watch
-        for app in list(self._watched_apps.keys()):
-            if app.is_game and app.id not in to_watch:
-                del self._watched_apps[app]
+        for game_id in [id_ for id_ in self._games if id_ not in to_watch]:
+            app = self._games.pop(game_id)
+            for pid in app.procs:
+                self._pid_index.pop(pid, None)
+            self._running.discard(game_id)
         # add games from to_watch keeping its processes if already present
         for game_id, path in to_watch.items():
-            self._watched_apps.setdefault(WatchedApp(game_id, path), set())
+            app = self._games.get(game_id)
+            if app is None:
+                self._games[game_id] = WatchedApp(game_id, path)
+                self._rematch = True
+            elif app.dir != path:
+                app.dir = path
+                self._rematch = True
+
+    def _get_app(self, app_id: str) -> Optional[WatchedApp]:
+        app = self._games.get(app_id)
+        if app is None:
+            app = self._launchers.get(app_id)
+        return app
 
-    def _get_running_games(self):
+    def _track(self, app: WatchedApp, proc: psutil.Process):
+        app.procs[proc.pid] = proc
+        self._pid_index[proc.pid] = app
+        if app.is_game:
+            self._running.add(app.id)
+
+    def _untrack(self, pid: int):
+        app = self._pid_index.pop(pid)
+        del app.procs[pid]
+        if app.is_game and not app.procs:
+            self._running.discard(app.id)
+
+    def _get_running_games(self) -> Set[str]:
         self.__remove_processes_if_dead()
-        return set([game.id for game, procs in self.watched_games.items() if procs])
+        return set(self._running)
 
-    def _is_app_tracked_and_running(self, app):
-        if app in self._watched_apps:
-            for proc in self._watched_apps[app]:
-                if proc.is_running:
+    def _is_app_tracked_and_running(self, app_id: str):
+        app = self._get_app(app_id)
+        if app is not None:
+            for proc in app.procs.values():
+                if proc.is_running():
                     return True
         return False
 
-    def _serach_in_all(self):
-        """Fat check"""
-        log.debug(f'Performing check for all processes')
-        for proc in psutil.process_iter(ad_value=''):
-            self.__match_process(proc)
+    async def _serach_in_all(self, max_age=None, interval=0):
+        """Fat check served by the shared snapshot service; 0.02 interval lasts a few seconds"""
+        await self._snapshots.get(max_age, interval)
 
-    async def _serach_in_all_slowly(self, interval=0.02):
-        """Fat check with async intervals; 0.02 lasts a few seconds"""
-        log.debug(f'Performing async check in all processes; interval: {interval}')
-        for proc in psutil.process_iter(ad_value=''):
-            self.__match_process(proc)
-            await asyncio.sleep(interval)
+    async def _on_snapshot(self, snapshot: ProcessSnapshot):
+        for pid in snapshot.removed:
+            if pid in self._pid_index:
+                log.debug(f'Process {pid} is gone')
+                self._untrack(pid)
+        pids = snapshot.procs if self._rematch else snapshot.added
+        self._rematch = False
+        for i, pid in enumerate(pids, 1):
+            self.__match_path(snapshot.procs[pid], snapshot.exes[pid])
+            # matching whole table against many games takes long; do not block the loop with it
+            if i % self._MATCH_YIELD_EVERY == 0:
+                await asyncio.sleep(0)
 
     def _search_in_children(self, procs: Iterable[psutil.Process], recursive=True):
         """Cache only child processes because process_iter has its own module level cache"""
@@ -89,58 +217,77 @@ class _ProcessWatcher:
         :param skip_running     only check if watched_games is empty
         """
         if skip_running:
-            candidates = self.watched_games
+            needed = len(self._games) > 0
         else:
-            candidates = [gm for gm, procs in self.watched_games.items() if not procs]
-        if len(candidates) == 0:
+            needed = len(self._games) > len(self._running)
+        if not needed:
             log.debug('ProcessWatcher: parsing not needed')
-            return False
-        return True
+        return needed
 
     def __match_process(self, proc):
-        for game in self._watched_apps:
-            try:
-                path = proc.exe()
-            except (psutil.AccessDenied, psutil.NoSuchProcess):
-                pass
-            else:
-                if not path:
-                    return False
-                elif game.dir in path:
-                    self._watched_apps[game].add(proc)
+        if proc.pid in self._pid_index:
+            return True
+        try:
+            path = proc.exe()
+        except (psutil.AccessDenied, psutil.NoSuchProcess):
+            return False
+        return self.__match_path(proc, path)
+
+    def __match_path(self, proc, path):
+        if proc.pid in self._pid_index:
+            return True
+        if not path:
+            return False
+        for apps in (self._launchers, self._games):
+            for app in apps.values():
+                if app.dir in path:
+                    self._track(app, proc)
                     return True
         return False
 
     def __remove_processes_if_dead(self):
-        for game, processes in self._watched_apps.items():
-            # work on copy to avoid adding processes during iteration
-            for proc in processes.copy():
-                if not proc.is_running() or proc.status() == psutil.STATUS_ZOMBIE:
-                    log.debug(f'Process {proc} is dead')
-                    self._watched_apps[game].remove(proc)
+        # work on copy to avoid removing processes during iteration
+        for pid, app in list(self._pid_index.items()):
+            proc = app.procs[pid]
+            try:
+                dead = not proc.is_running() or proc.status() == psutil.STATUS_ZOMBIE
+            except psutil.NoSuchProcess:
+                dead = True
+            if dead:
+                log.debug(f'Process {proc} is dead')
+                self._untrack(pid)
 
 
 class ProcessWatcher(_ProcessWatcher):
     _LAUNCHER_ID = '__launcher__'
 
-    def __init__(self, launcher_identifier):
-        super().__init__()
-        self._watched_apps[WatchedApp(self._LAUNCHER_ID, launcher_identifier, False)]
+    def __init__(self, launcher_identifier, snapshots: Optional[ProcessSnapshotService] = None):
+        super().__init__(snapshots)
+        self._launchers[self._LAUNCHER_ID] = WatchedApp(self._LAUNCHER_ID, launcher_identifier, False)
         self._launcher_children_cache = set()
+        self._launcher_children_checked = 0.0
 
     @property
     def _launcher(self):
-        return self._watched_apps[self._LAUNCHER_ID]
+        return self._launchers[self._LAUNCHER_ID].procs.values()
 
     def _is_launcher_running(self):
         return self._is_app_tracked_and_running(self._LAUNCHER_ID)
 
+    def _search_in_launcher_children(self, max_age=0.0):
+        """Skip the check if other caller has done it within max_age seconds"""
+        now = time.time()
+        if now - self._launcher_children_checked < max_age:
+            return
+        self._launcher_children_checked = now
+        self._search_in_children(list(self._launcher), recursive=True)
+
     async def _pool_until_launcher_start(self, timeout, long_interval):
         start = time.time()
         while time.time() - start < timeout:
             if self._is_launcher_running():
                 return True
-            self._serach_in_all()
+            await self._serach_in_all(max_age=long_interval)
             await asyncio.sleep(long_interval)
         return False
 
@@ -154,14 +301,14 @@ class ProcessWatcher(_ProcessWatcher):
         while time.time() - start < timeout:
             found = await self._pool_until_launcher_start(timeout, lint)
             if found:
-                self._search_in_children(self._launcher)
-                if self._watched_apps[game_id]:
+                self._search_in_launcher_children(max_age=sint)
+                if game_id in self._running:
                     log.debug(f'Game process found in {time.time() - start}s')
                     return True
                 await asyncio.sleep(sint)
 
-        self._serach_in_all()
-        if self._watched_apps[game_id]:
+        await self._serach_in_all()
+        if game_id in self._running:
             log.debug(f'Game process found in the final fallback parsing all processes')
             return True
 
@@ -169,8 +316,8 @@ class ProcessWatcher(_ProcessWatcher):
         """Return set of ids of currently running games.
         Note: does not actively look for launcher
         """
-        if not self._is_anything_to_watch():
+        if not self._games:
             return set()
-        if check_under_launcher and self._is_launcher_running():
-            self._search_in_children(self._launcher, recursive=True)
+        if check_under_launcher and self._is_anything_to_watch() and self._is_launcher_running():
+            self._search_in_launcher_children()
         return self._get_running_games()
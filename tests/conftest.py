@@ -0,0 +1,5 @@
+import consts
+
+# launcher process is defined only for Windows and macOS; local games are not detected elsewhere
+if not hasattr(consts, 'LAUNCHER_PROCESS_IDENTIFIER'):
+    consts.LAUNCHER_PROCESS_IDENTIFIER = 'EpicGamesLauncher.exe'
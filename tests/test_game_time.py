@@ -0,0 +1,72 @@
+import pytest
+
+from game_time import GameTimeTracker
+
+
+@pytest.fixture
+def clock(mocker):
+    now = mocker.patch('game_time.time.time')
+    now.return_value = 1000
+    return now
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return str(tmp_path / 'game_times.journal')
+
+
+def play(tracker, clock, game_id, start, end):
+    clock.return_value = start
+    tracker.start_session(game_id)
+    clock.return_value = end
+    tracker.end_session(game_id)
+
+
+def test_never_played(journal, clock):
+    assert GameTimeTracker(journal).get('a') == (None, None)
+
+
+def test_running_session_counted(journal, clock):
+    tracker = GameTimeTracker(journal)
+    tracker.start_session('a')
+    clock.return_value = 1000 + 5 * 60
+    assert tracker.get('a') == (5, 1000 + 5 * 60)
+
+
+def test_totals_survive_reload(journal, clock):
+    tracker = GameTimeTracker(journal)
+    play(tracker, clock, 'a', 1000, 1000 + 10 * 60)
+    play(tracker, clock, 'a', 5000, 5000 + 20 * 60)
+    play(tracker, clock, 'b', 6000, 6000 + 60)
+    assert tracker.consume_updated_games() == {'a', 'b'}
+
+    reloaded = GameTimeTracker(journal)
+    assert reloaded.get('a') == (30, 5000 + 20 * 60)
+    assert reloaded.get('b') == (1, 6000 + 60)
+
+
+def test_load_compacts_sessions(journal, clock):
+    with open(journal, 'w', encoding='utf-8') as f:
+        f.write('T\ta\t600\t2000\n')
+        f.write('S\ta\t3000\t3120\n')
+        f.write('S\tb\t4000\t4060\n')
+        f.write('malformed\n')
+
+    tracker = GameTimeTracker(journal)
+    assert tracker.get('a') == (12, 3120)
+    assert tracker.get('b') == (1, 4060)
+    with open(journal, encoding='utf-8') as f:
+        assert sorted(f.read().splitlines()) == ['T\ta\t720\t3120', 'T\tb\t60\t4060']
+
+
+def test_compaction_after_many_sessions_keeps_totals(journal, clock):
+    tracker = GameTimeTracker(journal)
+    for i in range(GameTimeTracker.COMPACT_AFTER_SESSIONS):
+        play(tracker, clock, 'a', 10000 + i * 100, 10000 + i * 100 + 60)
+    tracker.compact_if_needed()
+
+    sessions = GameTimeTracker.COMPACT_AFTER_SESSIONS
+    with open(journal, encoding='utf-8') as f:
+        assert f.read().splitlines() == [f'T\ta\t{sessions * 60}\t{10000 + (sessions - 1) * 100 + 60}']
+    play(tracker, clock, 'a', 50000, 50000 + 60)
+    assert GameTimeTracker(journal).get('a') == (sessions + 1, 50060)
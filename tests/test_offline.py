@@ -0,0 +1,285 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import aiohttp
+import pytest
+from galaxy.api.errors import BackendTimeout, NetworkError
+from galaxy.api.types import Authentication, FriendInfo
+
+from cache import AccountCache, FriendsCache, OwnedGamesCache
+from http_client import AuthenticatedHttpClient
+from plugin import EpicPlugin
+
+
+class FakeResponse:
+    def __init__(self, status=200, content=None):
+        self.status = status
+        self._content = content or {}
+
+    async def json(self):
+        return self._content
+
+    def release(self):
+        pass
+
+
+class FakeSession:
+    """Answers consecutive requests with given responses or exceptions"""
+    def __init__(self, *results):
+        self.results = list(results)
+        self.requests = []
+
+    async def request(self, method, url, **kwargs):
+        self.requests.append(method)
+        result = self.results.pop(0)
+        if isinstance(result, BaseException):
+            raise result
+        return result
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def client():
+    client = AuthenticatedHttpClient(store_credentials_callback=MagicMock())
+    client._access_token = 'access'
+    client._account_id = 'account'
+    yield client
+    if client._probe_task is not None:
+        client._probe_task.cancel()
+
+
+@pytest.fixture
+def sleeps(mocker):
+    """Probe intervals; the probe runs without waiting"""
+    intervals = []
+
+    async def sleep(interval):
+        intervals.append(interval)
+    mocker.patch('http_client.asyncio.sleep', sleep)
+    return intervals
+
+
+@pytest.mark.asyncio
+async def test_lost_connection_switches_to_offline(client):
+    client._session = FakeSession(aiohttp.ClientConnectionError())
+
+    with pytest.raises(NetworkError):
+        await client.get('url')
+    assert client.offline
+    assert client._probe_task is not None
+
+
+@pytest.mark.asyncio
+async def test_offline_requests_fail_without_network(client):
+    client._session = FakeSession(aiohttp.ClientConnectionError())
+    with pytest.raises(NetworkError):
+        await client.get('url')
+
+    with pytest.raises(NetworkError):
+        await client.get('url')
+    client._access_token = None
+    with pytest.raises(NetworkError):
+        await client.get('url')
+    assert client._session.requests == ['GET']
+
+
+@pytest.mark.asyncio
+async def test_timeout_is_not_offline(client):
+    client._session = FakeSession(asyncio.TimeoutError())
+
+    with pytest.raises(BackendTimeout):
+        await client.get('url')
+    assert not client.offline
+    assert client._probe_task is None
+
+
+@pytest.mark.asyncio
+async def test_probe_backs_off_until_network_is_back(client, sleeps):
+    back_online = MagicMock()
+    client.set_back_online_callback(back_online)
+    client._session = FakeSession(
+        aiohttp.ClientConnectionError(),
+        aiohttp.ClientConnectionError(),
+        asyncio.TimeoutError(),
+        FakeResponse()
+    )
+
+    client._went_offline()
+    await client._probe_task
+
+    assert sleeps == [5, 10, 20, 40]
+    assert client._session.requests == ['HEAD'] * 4
+    assert not client.offline
+    assert client._probe_task is None
+    back_online.assert_called_once_with()
+
+
+@pytest.mark.asyncio
+async def test_probe_interval_is_capped(client, sleeps):
+    client._session = FakeSession(*[aiohttp.ClientConnectionError()] * 8, FakeResponse())
+
+    client._went_offline()
+    await client._probe_task
+
+    assert sleeps == [5, 10, 20, 40, 80, 160, 300, 300, 300]
+
+
+@pytest.mark.asyncio
+async def test_requests_work_again_after_probe(client, sleeps):
+    client._session = FakeSession(aiohttp.ClientConnectionError(), FakeResponse(), FakeResponse(content={'a': 1}))
+    with pytest.raises(NetworkError):
+        await client.get('url')
+    await client._probe_task
+
+    response = await client.get('url')
+    assert await response.json() == {'a': 1}
+
+
+@pytest.fixture
+def friends_cache(tmp_path):
+    return FriendsCache(str(tmp_path / 'friends.json'))
+
+
+@pytest.fixture
+def plugin(friends_cache, tmp_path, mocker):
+    plugin = EpicPlugin(MagicMock(), MagicMock(), 'token')
+    plugin._friends_cache = friends_cache
+    plugin._owned_games_cache = OwnedGamesCache(str(tmp_path / 'owned_games.json'))
+    plugin._account_cache = AccountCache(str(tmp_path / 'account.json'))
+    plugin._http_client._account_id = 'account'
+    for notification in ('add_friend', 'remove_friend', 'lost_authentication'):
+        mocker.patch.object(plugin, notification)
+    yield plugin
+    if plugin._http_client._probe_task is not None:
+        plugin._http_client._probe_task.cancel()
+
+
+def backend_friends(plugin, result):
+    async def get_friends():
+        if isinstance(result, Exception):
+            raise result
+        return result
+    plugin._get_friends = get_friends
+
+
+@pytest.mark.asyncio
+async def test_fetched_friends_are_stored(plugin, friends_cache):
+    friends = [FriendInfo('a', 'A')]
+    backend_friends(plugin, friends)
+
+    assert await plugin.get_friends() == friends
+    assert friends_cache.load('account') == friends
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('error', [NetworkError(), BackendTimeout()])
+async def test_cached_friends_served_without_network(plugin, friends_cache, error):
+    friends = [FriendInfo('a', 'A')]
+    friends_cache.save('account', friends)
+    backend_friends(plugin, error)
+
+    assert await plugin.get_friends() == friends
+
+
+@pytest.mark.asyncio
+async def test_without_cached_friends_network_error_is_raised(plugin):
+    backend_friends(plugin, NetworkError())
+
+    with pytest.raises(NetworkError):
+        await plugin.get_friends()
+
+
+@pytest.mark.asyncio
+async def test_refreshed_friends_are_diffed_with_cache(plugin, friends_cache):
+    friends_cache.save('account', [FriendInfo('a', 'A'), FriendInfo('b', 'B')])
+    backend_friends(plugin, [FriendInfo('b', 'B'), FriendInfo('c', 'C')])
+
+    await plugin._refresh_friends()
+
+    plugin.remove_friend.assert_called_once_with('a')
+    plugin.add_friend.assert_called_once_with(FriendInfo('c', 'C'))
+    assert friends_cache.load('account') == [FriendInfo('b', 'B'), FriendInfo('c', 'C')]
+
+
+@pytest.mark.asyncio
+async def test_failed_friends_refresh_keeps_cache(plugin, friends_cache):
+    friends = [FriendInfo('a', 'A')]
+    friends_cache.save('account', friends)
+    backend_friends(plugin, NetworkError())
+
+    await plugin._refresh_friends()
+
+    plugin.remove_friend.assert_not_called()
+    plugin.add_friend.assert_not_called()
+    assert friends_cache.load('account') == friends
+
+
+def cache_account(plugin):
+    plugin._account_cache.save('account', 'Name')
+    plugin._owned_games_cache.save('account', [])
+    plugin._friends_cache.save('account', [])
+
+
+@pytest.mark.asyncio
+async def test_offline_start_authenticates_from_cache(plugin):
+    cache_account(plugin)
+    plugin._http_client._account_id = None
+    plugin._http_client._session = FakeSession(aiohttp.ClientConnectionError())
+
+    assert await plugin.authenticate({'refresh_token': 'token'}) == Authentication('account', 'Name')
+    assert plugin._http_client.account_id == 'account'
+    assert plugin._http_client.refresh_token == 'token'
+
+
+@pytest.mark.asyncio
+async def test_offline_start_without_cached_library_fails(plugin):
+    plugin._account_cache.save('account', 'Name')
+    plugin._friends_cache.save('account', [])
+    plugin._http_client._session = FakeSession(aiohttp.ClientConnectionError())
+
+    with pytest.raises(NetworkError):
+        await plugin.authenticate({'refresh_token': 'token'})
+
+
+@pytest.mark.asyncio
+async def test_start_timeout_is_not_served_from_cache(plugin):
+    cache_account(plugin)
+    plugin._http_client._session = FakeSession(asyncio.TimeoutError())
+
+    with pytest.raises(BackendTimeout):
+        await plugin.authenticate({'refresh_token': 'token'})
+
+
+@pytest.mark.asyncio
+async def test_session_restored_after_offline_start(plugin, mocker):
+    plugin._offline_session = True
+    plugin._http_client._refresh_token = 'token'
+    refreshed = []
+
+    async def authenticate_with_refresh_token(refresh_token):
+        refreshed.append(refresh_token)
+    plugin._http_client.authenticate_with_refresh_token = authenticate_with_refresh_token
+    refresh = mocker.patch.object(plugin, '_refresh_after_offline')
+
+    await plugin._restore_session()
+
+    assert refreshed == ['token']
+    assert not plugin._offline_session
+    refresh.assert_called_once_with()
+
+
+@pytest.mark.asyncio
+async def test_rejected_token_after_offline_start_loses_authentication(plugin, mocker):
+    plugin._offline_session = True
+
+    async def authenticate_with_refresh_token(refresh_token):
+        raise Exception('invalid_grant')
+    plugin._http_client.authenticate_with_refresh_token = authenticate_with_refresh_token
+    refresh = mocker.patch.object(plugin, '_refresh_after_offline')
+
+    await plugin._restore_session()
+
+    plugin.lost_authentication.assert_called_once_with()
+    refresh.assert_not_called()
@@ -0,0 +1,113 @@
+from unittest.mock import MagicMock
+
+import pytest
+from galaxy.api.consts import LicenseType
+from galaxy.api.errors import BackendError
+from galaxy.api.types import Game, LicenseInfo
+
+from cache import OwnedGamesCache
+from plugin import EpicPlugin
+
+
+def create_game(game_id, title):
+    return Game(game_id, title, None, LicenseInfo(LicenseType.SinglePurchase))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return OwnedGamesCache(str(tmp_path / 'owned_games.json'))
+
+
+@pytest.fixture
+def plugin(cache, mocker):
+    plugin = EpicPlugin(MagicMock(), MagicMock(), 'token')
+    plugin._owned_games_cache = cache
+    plugin._http_client._account_id = 'account'
+    for notification in ('add_game', 'remove_game', 'update_game'):
+        mocker.patch.object(plugin, notification)
+    return plugin
+
+
+def backend_games(plugin, *results):
+    """Make consecutive owned games syncs return or raise given results"""
+    results = list(results)
+
+    async def get_owned_games():
+        result = results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    plugin._get_owned_games = get_owned_games
+
+
+def test_cache_round_trip(cache):
+    games = [create_game('a', 'A'), create_game('b', 'B')]
+    cache.save('account', games)
+    assert cache.load('account') == games
+
+
+def test_cache_of_other_account_is_ignored(cache):
+    cache.save('account', [create_game('a', 'A')])
+    assert cache.load('other') is None
+
+
+def test_missing_cache(cache):
+    assert cache.load('account') is None
+
+
+@pytest.mark.parametrize('content', ['not json', '[]', '{"account_id": "account", "games": [{"title": "A"}]}'])
+def test_corrupted_cache_is_ignored(cache, tmp_path, content):
+    (tmp_path / 'owned_games.json').write_text(content)
+    assert cache.load('account') is None
+
+
+@pytest.mark.asyncio
+async def test_without_cache_games_are_fetched_and_stored(plugin, cache):
+    games = [create_game('a', 'A')]
+    backend_games(plugin, games)
+
+    assert await plugin.get_owned_games() == games
+    assert cache.load('account') == games
+    plugin._refresh_owned_task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_cached_games_reconciled_in_background(plugin, cache):
+    cached = [create_game('a', 'A'), create_game('b', 'B'), create_game('c', 'Old title')]
+    cache.save('account', cached)
+    current = [create_game('a', 'A'), create_game('c', 'New title'), create_game('d', 'D')]
+    backend_games(plugin, current)
+
+    assert await plugin.get_owned_games() == cached
+    await plugin._refresh_owned_task
+
+    plugin.remove_game.assert_called_once_with('b')
+    plugin.update_game.assert_called_once_with(create_game('c', 'New title'))
+    plugin.add_game.assert_called_once_with(create_game('d', 'D'))
+    assert sorted(cache.load('account'), key=lambda game: game.game_id) == current
+
+
+@pytest.mark.asyncio
+async def test_failed_reconcile_is_retried_before_new_games_check(plugin, cache, mocker):
+    cache.save('account', [create_game('a', 'A'), create_game('b', 'B')])
+    backend_games(plugin, BackendError(), [create_game('a', 'A')])
+    async def no_sleep(delay):
+        pass
+    mocker.patch('plugin.asyncio.sleep', no_sleep)
+
+    await plugin.get_owned_games()
+    await plugin._refresh_owned_task
+    plugin.remove_game.assert_not_called()
+
+    plugin.tick()
+    await plugin._refresh_owned_task
+    plugin.remove_game.assert_called_once_with('b')
+
+    checks = []
+
+    async def check_for_new_games():
+        checks.append(True)
+    plugin._check_for_new_games = check_for_new_games
+    plugin.tick()
+    await plugin._refresh_owned_task
+    assert checks == [True]
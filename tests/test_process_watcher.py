@@ -0,0 +1,126 @@
+import asyncio
+import time
+from unittest.mock import Mock
+
+import psutil
+import pytest
+
+from process_watcher import ProcessSnapshot, ProcessWatcher
+
+LAUNCHER_EXE = 'C:\\Program Files (x86)\\Epic Games\\Launcher\\Portal\\Binaries\\Win64\\EpicGamesLauncher.exe'
+
+
+def create_process(pid, exe, children=()):
+    proc = Mock(pid=pid)
+    proc.exe.return_value = exe
+    proc.children.return_value = list(children)
+    proc.is_running.return_value = True
+    proc.status.return_value = psutil.STATUS_RUNNING
+    return proc
+
+
+@pytest.fixture
+def watcher():
+    watcher = ProcessWatcher('EpicGamesLauncher')
+    watcher.watched_games = {'a': 'D:\\Games\\A', 'b': 'D:\\Games\\B'}
+    return watcher
+
+
+@pytest.fixture
+def process_table(mocker):
+    table = []
+    mocker.patch('psutil.process_iter', side_effect=lambda *args, **kwargs: iter(list(table)))
+    return table
+
+
+def test_game_start_and_stop_under_launcher(watcher):
+    game = create_process(20, 'D:\\Games\\A\\a.exe')
+    launcher = create_process(10, LAUNCHER_EXE, [game])
+    watcher._ProcessWatcher__match_process(launcher)
+
+    assert watcher.get_running_games(check_under_launcher=True) == {'a'}
+
+    game.is_running.return_value = False
+    assert watcher.get_running_games(check_under_launcher=False) == set()
+    assert watcher._is_anything_to_watch()
+
+
+def test_running_games_reported_when_all_watched_games_run(watcher):
+    game_a = create_process(20, 'D:\\Games\\A\\a.exe')
+    game_b = create_process(21, 'D:\\Games\\B\\b.exe')
+    launcher = create_process(10, LAUNCHER_EXE, [game_a, game_b])
+    watcher._ProcessWatcher__match_process(launcher)
+
+    assert watcher.get_running_games(check_under_launcher=True) == {'a', 'b'}
+    assert not watcher._is_anything_to_watch()
+    assert watcher.get_running_games(check_under_launcher=True) == {'a', 'b'}
+
+
+@pytest.mark.asyncio
+async def test_process_gone_from_snapshot_is_untracked(watcher, process_table):
+    game = create_process(20, 'D:\\Games\\A\\a.exe')
+    process_table.extend([create_process(1, 'C:\\Windows\\explorer.exe'), game])
+    await watcher._serach_in_all(max_age=0)
+    assert watcher.get_running_games(check_under_launcher=False) == {'a'}
+
+    # process object still claims to be running; only the snapshot diff removes it
+    process_table.remove(game)
+    await watcher._serach_in_all(max_age=0)
+    assert watcher.get_running_games(check_under_launcher=False) == set()
+    assert 20 not in watcher._pid_index
+
+
+@pytest.mark.asyncio
+async def test_snapshot_rematched_after_watched_games_change(watcher, process_table):
+    process_table.append(create_process(30, 'D:\\Games\\C\\c.exe'))
+    await watcher._serach_in_all(max_age=0)
+    assert watcher.get_running_games(check_under_launcher=False) == set()
+
+    # the process is not new in the next snapshot, but the new game has to be matched against it
+    watcher.watched_games = {'a': 'D:\\Games\\A', 'c': 'D:\\Games\\C'}
+    await watcher._serach_in_all(max_age=0)
+    assert watcher.get_running_games(check_under_launcher=False) == {'c'}
+
+    watcher.watched_games = {'a': 'D:\\Games\\A'}
+    assert watcher.get_running_games(check_under_launcher=False) == set()
+    assert 30 not in watcher._pid_index
+
+
+@pytest.mark.asyncio
+async def test_concurrent_scans_are_shared(watcher, process_table):
+    process_table.append(create_process(20, 'D:\\Games\\A\\a.exe'))
+    await asyncio.gather(*[watcher._serach_in_all(max_age=1) for _ in range(3)])
+    await watcher._serach_in_all(max_age=1)
+    assert psutil.process_iter.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_fresh_scan_not_kept_behind_throttled_scan(watcher, process_table):
+    process_table.extend(create_process(pid, 'C:\\Windows\\svc.exe') for pid in range(100))
+    throttled = asyncio.ensure_future(watcher._serach_in_all(interval=0.1))
+    await asyncio.sleep(0)
+
+    start = time.time()
+    await watcher._serach_in_all(max_age=0)
+    assert time.time() - start < 1
+    await throttled
+
+
+@pytest.mark.asyncio
+async def test_matching_whole_table_yields_to_loop(watcher):
+    procs = {pid: create_process(pid, 'C:\\Windows\\svc.exe') for pid in range(200)}
+    snapshot = ProcessSnapshot(time.time(), procs, {pid: 'C:\\Windows\\svc.exe' for pid in procs}, list(procs), [])
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0)
+
+    task = asyncio.ensure_future(ticker())
+    await asyncio.sleep(0)
+    before = ticks
+    await watcher._on_snapshot(snapshot)
+    task.cancel()
+    assert ticks - before >= 3